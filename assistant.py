@@ -1,15 +1,17 @@
 import asyncio
 import os
+import re
 import signal
 import functools
-from typing import Optional, Callable, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Callable, Dict, Any, AsyncIterator, List, Tuple
 
 from .config import Config
 from .utils import logger, handle_exceptions
 from .emotion import EmotionState
 from .commands import CommandProcessor
 from .feedback import RewardSystem, InternalFeedback
-from .nlp import TextUnderstandingLayer
+from .nlp import TextUnderstandingLayer, NLP_BATCH_SIZE
 from .memory import MemoryCore
 
 # 🛡 Governor Engine
@@ -28,6 +30,73 @@ except Exception:
     Llama = None
     logger.warning("llama_cpp not available. Running without LLM.")
 
+# Optional numba (JIT for small numeric kernels)
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Repeating blocks + output layer of Mistral-7B; used to size partial offload.
+MODEL_N_LAYERS = 33
+
+# Half the logical CPUs (~physical cores on SMT machines) for llama.cpp's
+# compute threads.
+LLAMA_THREADS = max(1, (os.cpu_count() or 2) // 2)
+
+# Default pool for blocking I/O (input(), sync speak_fn, file writes, NLP).
+# These mostly wait rather than compute, so keep a floor even on small
+# machines; model loading and generation run on their own thread.
+WORKER_THREADS = max(4, LLAMA_THREADS)
+
+# How long the NLP batch worker waits for more queued inputs (seconds)
+NLP_BATCH_WINDOW = 0.02
+
+# Debounce for coalescing user-data writes (seconds)
+USER_DATA_SAVE_DELAY = 0.5
+
+# Debounce for batching memory log writes (seconds)
+MEMORY_WRITE_DELAY = 0.25
+
+# Split streamed LLM output into speakable sentences
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+# Intents that make an interaction worth remembering
+IMPORTANT_INTENTS = frozenset({"gratitude", "emotion_check", "conversation"})
+
+
+def _importance_kernel(
+    happiness: float, sadness: float, curiosity: float, compound: float, intent_bonus: float
+) -> float:
+    score = abs(happiness - 0.5) + abs(sadness) + abs(curiosity) + abs(compound) * 0.3 + intent_bonus
+    return min(score, 1.0)
+
+
+if njit:
+    _importance_kernel = njit(cache=True)(_importance_kernel)
+
+
+def _segment_tokenizer(model: Any) -> Callable[[str], List[int]]:
+    """
+    Tokenizer for text that continues an already tokenized prompt, so that
+    concatenated segments match tokenizing the joined string.
+
+    SentencePiece vocabularies (Mistral, Llama 2) add a dummy-prefix space
+    on every tokenize() call, which would start each segment with a stray
+    "▁". Every prompt segment follows a newline, so tokenize behind a
+    newline anchor and drop the anchor's tokens instead. If the anchor
+    merges with the text (some BPE vocabularies fuse newlines), fall back
+    to tokenizing the segment on its own.
+    """
+    anchor = model.tokenize(b"\n", add_bos=False)
+
+    def tokenize(text: str) -> List[int]:
+        tokens = model.tokenize(b"\n" + text.encode("utf-8"), add_bos=False)
+        if tokens[: len(anchor)] == anchor:
+            return tokens[len(anchor):]
+        return model.tokenize(text.encode("utf-8"), add_bos=False)
+
+    return tokenize
+
 
 class MikaAssistant:
     """
@@ -35,6 +104,36 @@ class MikaAssistant:
     Governor-aware cognitive assistant.
     """
 
+    __slots__ = (
+        "config",
+        "listen_fn",
+        "speak_fn",
+        "device",
+        "governor",
+        "emotion_engine",
+        "reward_system",
+        "internal_feedback",
+        "command_processor",
+        "nlp",
+        "memory",
+        "model",
+        "_llm_call",
+        "_static_prefix",
+        "_static_tokens",
+        "_tokenize_segment",
+        "_executor",
+        "_llm_executor",
+        "_model_task",
+        "shutdown_event",
+        "_running",
+        "_shutdown_done",
+        "_nlp_queue",
+        "_nlp_task",
+        "_user_data_dirty",
+        "_saver_task",
+        "_memory_writer_task",
+    )
+
     def __init__(
         self,
         config: Config,
@@ -50,7 +149,7 @@ class MikaAssistant:
             self.device = "cuda"
         else:
             self.device = "cpu"
-        logger.info(f"Using device: {self.device}")
+        logger.info("Using device: %s", self.device)
 
         # ---------------- Governor ---------------- #
         self.governor = GovernorEngine(
@@ -73,14 +172,48 @@ class MikaAssistant:
             importance_threshold=0.6,
         )
 
+        # Private worker pool for blocking calls (see _to_thread). Not
+        # installed as the loop's default executor, so shutting it down never
+        # affects other code sharing the loop.
+        self._executor = ThreadPoolExecutor(
+            max_workers=WORKER_THREADS, thread_name_prefix="mika"
+        )
+        # Model loading and token generation; kept apart so a long load or
+        # generation never starves input/speech of a worker
+        self._llm_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="mika-llm"
+        )
+
         # ---------------- Model ---------------- #
         self.model: Optional[Llama] = None
+        self._llm_call: Optional[Callable[..., Any]] = None
+        self._static_prefix = f"You are {self.config.ai_name}.\nRespond naturally.\n\n"
+        self._static_tokens: List[int] = []
+        self._tokenize_segment: Optional[Callable[[str], List[int]]] = None
+        self._model_task: Optional[asyncio.Future] = None
         if self.config.model_path and os.path.exists(self.config.model_path):
-            self._load_model()
+            self._schedule_model_load()
         else:
             logger.warning("No local model found. Using fallback responses.")
 
+        # Compile the importance kernel now rather than on the first turn
+        _importance_kernel(0.5, 0.2, 0.3, 0.0, 0.0)
+
         self.shutdown_event = asyncio.Event()
+        # start() is running / shutdown() has saved everything; whichever
+        # finishes last releases the pools and the memory log
+        self._running = False
+        self._shutdown_done = False
+
+        # Batched NLP (voice / multi-user). Text mode calls analyze() directly.
+        self._nlp_queue: asyncio.Queue = asyncio.Queue()
+        self._nlp_task: Optional[asyncio.Task] = None
+
+        # Write-behind for Config.save_user_data()
+        self._user_data_dirty = asyncio.Event()
+        self._saver_task: Optional[asyncio.Task] = None
+        self._memory_writer_task: Optional[asyncio.Task] = None
+        self.config._save_scheduler = self._schedule_user_data_save
 
     # --------------------------------------------------
     # Setup
@@ -101,24 +234,134 @@ class MikaAssistant:
                 pass
 
     def _signal_handler(self, sig: signal.Signals) -> None:
-        logger.info(f"Received signal {sig.name}, shutting down.")
+        logger.info("Received signal %s, shutting down.", sig.name)
         asyncio.create_task(self.shutdown())
 
     def _load_model(self) -> None:
         if not Llama:
             return
 
-        logger.info("Loading GGUF model...")
-        self.model = Llama(
-            model_path=self.config.model_path,
+        model_path = self._select_model_path()
+        if not model_path:
+            logger.warning("No .gguf model found in '%s'.", self.config.model_path)
+            return
+
+        logger.info("Loading GGUF model %s...", os.path.basename(model_path))
+        llama_kwargs = dict(
+            model_path=model_path,
             n_ctx=4096,
-            n_threads=os.cpu_count() or 4,
-            n_gpu_layers=40 if self.device == "cuda" else 0,
+            n_threads=LLAMA_THREADS,
+            n_batch=self.config.n_batch,
+            tensor_split=self.config.tensor_split,
+            use_mmap=self.config.use_mmap,
+            use_mlock=self.config.use_mlock,
+            flash_attn=self.config.flash_attn,
+            offload_kqv=self.config.offload_kqv,
             verbose=False,
         )
+        model = self._create_llama(model_path, llama_kwargs)
+
+        # Touch the model once so backend/context init and KV allocation
+        # happen here rather than on the first real turn.
+        model.eval(model.tokenize(b" "))
+        model.reset()
+
+        self._static_tokens = model.tokenize(
+            f"{self._static_prefix}Recent context:\n".encode("utf-8")
+        )
+        self._tokenize_segment = _segment_tokenizer(model)
+        self.memory.tokenizer = self._tokenize_segment
+        # Generation settings are fixed per session; bind them once.
+        self._llm_call = functools.partial(
+            model.create_completion,
+            max_tokens=256,
+            temperature=0.7,
+            top_p=0.9,
+            stop=["User:", f"{self.config.ai_name}:"],
+            stream=True,
+        )
+        self.model = model
+        logger.info("Model ready.")
+
+    def _create_llama(self, model_path: str, llama_kwargs: Dict[str, Any]) -> "Llama":
+        if self.device != "cuda":
+            return Llama(n_gpu_layers=0, **llama_kwargs)
+
+        if self.config.n_gpu_layers is not None:
+            return Llama(n_gpu_layers=self.config.n_gpu_layers, **llama_kwargs)
+
+        # Try full offload first, then back off towards what fits in free VRAM.
+        try:
+            return Llama(n_gpu_layers=-1, **llama_kwargs)
+        except (RuntimeError, ValueError) as e:
+            logger.warning("Full GPU offload failed (%s). Probing free VRAM.", e)
+
+        n_gpu_layers = self._estimate_gpu_layers(model_path)
+        while n_gpu_layers > 0:
+            try:
+                model = Llama(n_gpu_layers=n_gpu_layers, **llama_kwargs)
+                logger.info("Offloaded %d layers to GPU.", n_gpu_layers)
+                return model
+            except (RuntimeError, ValueError):
+                n_gpu_layers //= 2
+
+        logger.warning("GPU offload failed. Loading model on CPU.")
+        return Llama(n_gpu_layers=0, **llama_kwargs)
+
+    def _select_model_path(self) -> Optional[str]:
+        """
+        Resolve config.model_path to a .gguf file. When it is a directory,
+        prefer the file matching config.quantization (e.g. Q4_K_M, Q5_K_M).
+        """
+        path = self.config.model_path
+        if not os.path.isdir(path):
+            return path
+
+        ggufs = sorted(f for f in os.listdir(path) if f.lower().endswith(".gguf"))
+        if not ggufs:
+            return None
+
+        quant = self.config.quantization.lower()
+        match = next((f for f in ggufs if quant in f.lower()), None)
+        if match is None:
+            logger.warning(
+                "No %s model in '%s'. Using %s.", self.config.quantization, path, ggufs[0]
+            )
+            match = ggufs[0]
+        return os.path.join(path, match)
+
+    def _estimate_gpu_layers(self, model_path: str) -> int:
+        """
+        Estimate how many layers fit in free VRAM, assuming layers of equal size.
+        """
+        free_vram, _ = torch.cuda.mem_get_info()
+        model_bytes = os.path.getsize(model_path)
+        layer_bytes = model_bytes / MODEL_N_LAYERS
+        return max(1, min(MODEL_N_LAYERS, int(free_vram / layer_bytes * 0.9)))
+
+    def _schedule_model_load(self) -> None:
+        """
+        Load the model in a worker thread when an event loop is running so
+        startup does not block; otherwise load it inline.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._load_model()
+            return
+        self._model_task = loop.run_in_executor(self._llm_executor, self._load_model)
+
+    async def _model_ready(self) -> None:
+        if self._model_task is None:
+            return
+        try:
+            await self._model_task
+        except Exception as e:
+            logger.error("Model failed to load: %s", e)
+        self._model_task = None
 
     async def _fallback_input(self) -> str:
-        return await asyncio.to_thread(input, f"{self.config.user_name}> ")
+        return await self._to_thread(input, f"{self.config.user_name}> ")
 
     async def _fallback_speak(self, text: str) -> None:
         print(f"{self.config.ai_name}> {text}")
@@ -129,45 +372,73 @@ class MikaAssistant:
 
     @handle_exceptions
     async def start(self) -> None:
-        await self.speak(f"{self.config.ai_name} is online.")
-        while not self.shutdown_event.is_set():
-            user_text = await self.listen_fn()
-            if not user_text:
-                continue
-            await self.handle_input(str(user_text).strip())
+        self._running = True
+        try:
+            if self.config.mode != "text":
+                self._nlp_task = asyncio.create_task(self._nlp_batch_worker())
+            self._saver_task = asyncio.create_task(self._user_data_saver())
+            self._memory_writer_task = asyncio.create_task(
+                self.memory.run_writer(MEMORY_WRITE_DELAY)
+            )
+            await self.speak(f"{self.config.ai_name} is online.")
+            while not self.shutdown_event.is_set():
+                user_text = await self.listen_fn()
+                if not user_text:
+                    continue
+                await self.handle_input(str(user_text).strip())
+        finally:
+            self._running = False
+            # A shutdown that landed mid-turn left cleanup to us
+            if self._shutdown_done:
+                self._release()
+
+    def _to_thread(self, func: Callable[..., Any], *args: Any) -> asyncio.Future:
+        """Run a blocking call on the assistant's own worker pool."""
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(func, *args)
+        )
 
     async def handle_input(self, text: str) -> None:
         """
         Core interaction pipeline.
         """
+        # ---------------- Trivial input (partial speech, punctuation) ---------------- #
+        if len(text) < 2 or not any(c.isalnum() for c in text):
+            await self.speak("I’m listening.")
+            return
+
         # ---------------- Governor: cognition allowed? ---------------- #
         if not self.governor.allows("cognition.reason"):
             await self.speak("I’m not allowed to reason right now.")
             return
 
         # ---------------- NLP ---------------- #
-        intent, metadata = await asyncio.to_thread(self.nlp.analyze, text)
+        intent, metadata = await self._analyze(text)
         emotion_before = self.emotion_engine.emotional_summary()
+        text_lower = text.lower()
+        metadata["text_lower"] = text_lower
 
         # ---------------- Command Path ---------------- #
-        if text.lower() in self.config.commands:
+        spoken: Optional[str] = None
+        command_ref = self.command_processor.lookup(text_lower)
+        if command_ref is not None:
             if not self.governor.allows("tools.execute_code_in_sandbox"):
                 response = "I’m not permitted to execute that command."
             else:
                 try:
-                    handler = self.command_processor.resolve_handler(
-                        self.config.commands[text.lower()]
-                    )
+                    handler = self.command_processor.resolve_handler(command_ref)
                     response = await handler(text, metadata)
                     self.reward_system.apply_reward(1, "command_success")
                 except Exception:
                     response = "I couldn’t complete that command."
                     self.reward_system.apply_reward(-1, "command_failure")
         else:
-            response = await asyncio.to_thread(self._llm_response, text)
+            await self._model_ready()
+            response = await self._speak_llm_response(text)
+            spoken = response
 
         # ---------------- Internal Feedback ---------------- #
-        adjusted_response, _, _ = await asyncio.to_thread(
+        adjusted_response, _, _ = await self._to_thread(
             self.internal_feedback.evaluate_response, text, response
         )
 
@@ -184,7 +455,91 @@ class MikaAssistant:
             importance=importance,
         )
 
-        await self.speak(adjusted_response)
+        # LLM replies were already spoken while streaming; only voice what
+        # internal feedback appended.
+        if spoken is None:
+            await self.speak(adjusted_response)
+        elif adjusted_response.startswith(spoken) and adjusted_response != spoken:
+            await self.speak(adjusted_response[len(spoken):].strip())
+
+    # --------------------------------------------------
+    # Persistence
+    # --------------------------------------------------
+
+    def _schedule_user_data_save(self) -> None:
+        if self._saver_task is None:
+            self.config.write_user_data()
+            return
+        self._user_data_dirty.set()
+
+    async def _user_data_saver(self) -> None:
+        """
+        Coalesce save requests: one write per debounce window.
+        """
+        while True:
+            await self._user_data_dirty.wait()
+            await asyncio.sleep(USER_DATA_SAVE_DELAY)
+            self._user_data_dirty.clear()
+            await self._flush_user_data()
+
+    async def _flush_user_data(self) -> None:
+        """
+        Serialize user data here on the loop thread, where it is mutated, and
+        only hand the finished bytes to a worker for the file write.
+        """
+        try:
+            data = self.config.user_data_bytes()
+        except Exception as e:
+            logger.error("Failed to serialize user data: %s", e)
+            return
+        await self._to_thread(self.config.write_user_data, data)
+
+    # --------------------------------------------------
+    # NLP Batching
+    # --------------------------------------------------
+
+    async def _analyze(self, text: str):
+        if self._nlp_task is None:
+            return await self._to_thread(self.nlp.analyze, text)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._nlp_queue.put((text, future))
+        return await future
+
+    async def _nlp_batch_worker(self) -> None:
+        """
+        Drain queued inputs in small batches and analyze them in one pass.
+        A lone input is analyzed at once; the batch window is only waited
+        out when more inputs are already pending. When the worker is
+        cancelled, every waiting _analyze() call is cancelled with it.
+        """
+        batch: List[Tuple[str, asyncio.Future]] = []
+        try:
+            while True:
+                batch = [await self._nlp_queue.get()]
+                if not self._nlp_queue.empty():
+                    await asyncio.sleep(NLP_BATCH_WINDOW)
+                while len(batch) < NLP_BATCH_SIZE and not self._nlp_queue.empty():
+                    batch.append(self._nlp_queue.get_nowait())
+
+                try:
+                    results = await self._to_thread(
+                        self.nlp.analyze_batch, [text for text, _ in batch]
+                    )
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            while not self._nlp_queue.empty():
+                batch.append(self._nlp_queue.get_nowait())
+            for _, future in batch:
+                future.cancel()
 
     # --------------------------------------------------
     # Intelligence Helpers
@@ -193,45 +548,87 @@ class MikaAssistant:
     def _estimate_importance(
         self, intent: str, sentiment: Dict[str, Any], emotion: Dict[str, float]
     ) -> float:
-        score = (
-            abs(emotion.get("happiness", 0.5) - 0.5)
-            + abs(emotion.get("sadness", 0.2))
-            + abs(emotion.get("curiosity", 0.3))
+        return _importance_kernel(
+            float(emotion.get("happiness", 0.5)),
+            float(emotion.get("sadness", 0.2)),
+            float(emotion.get("curiosity", 0.3)),
+            float(sentiment.get("compound", 0.0)) if sentiment else 0.0,
+            0.2 if intent in IMPORTANT_INTENTS else 0.0,
         )
 
-        if intent in {"gratitude", "emotion_check", "conversation"}:
-            score += 0.2
-
-        if sentiment:
-            score += abs(sentiment.get("compound", 0.0)) * 0.3
+    def _build_prompt(self, prompt: str) -> List[int]:
+        """
+        Assemble the prompt as token ids. The persona and each memory turn
+        are tokenized once and cached; only the per-turn tail is tokenized
+        here.
+        """
+        emotional_trend = self.memory.get_emotional_trend()
+        tail = (
+            f"\nEmotional trend:\n{emotional_trend}\n"
+            f"\nUser: {prompt}\n{self.config.ai_name}:"
+        )
 
-        return min(score, 1.0)
+        # llama.cpp reuses the KV cache for the longest common token prefix
+        # with the previous call. Keep the persona first, then the transcript,
+        # and put the per-turn emotional trend last so it is the only part
+        # re-prefilled besides the new turns. The transcript only grows at
+        # the end, except every context_block turns when its oldest turns
+        # are dropped together; the transcript is fully re-prefilled then.
+        return (
+            self._static_tokens
+            + self.memory.get_recent_context_tokens()
+            + self._tokenize_segment(tail)
+        )
 
-    def _llm_response(self, prompt: str) -> str:
+    async def _llm_response_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Yield generated text chunks as llama.cpp produces them.
+        Generation runs in a worker thread and hands chunks back to the loop.
+        """
         if not self.model:
-            return "I’m listening. Tell me more."
+            yield "I’m listening. Tell me more."
+            return
 
-        memory_context = self.memory.get_recent_context()
-        emotional_trend = self.memory.get_emotional_trend()
+        full_prompt = self._build_prompt(prompt)
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
 
-        system_prompt = (
-            f"You are {self.config.ai_name}.\n"
-            f"Recent context:\n{memory_context}\n\n"
-            f"Emotional trend:\n{emotional_trend}\n\n"
-            f"Respond naturally.\n"
-        )
+        def produce() -> None:
+            try:
+                for out in self._llm_call(full_prompt):
+                    loop.call_soon_threadsafe(
+                        chunks.put_nowait, out["choices"][0].get("text", "")
+                    )
+            finally:
+                loop.call_soon_threadsafe(chunks.put_nowait, None)
 
-        full_prompt = f"{system_prompt}\nUser: {prompt}\n{self.config.ai_name}:"
-        out = self.model(
-            full_prompt,
-            max_tokens=256,
-            temperature=0.7,
-            top_p=0.9,
-            stop=["User:", f"{self.config.ai_name}:"],
-        )
+        producer = loop.run_in_executor(self._llm_executor, produce)
+        while (chunk := await chunks.get()) is not None:
+            if chunk:
+                yield chunk
+        await producer  # re-raise errors from the generation thread
 
-        text = out["choices"][0].get("text", "")
-        return text.strip() if text else "I’m listening."
+    async def _speak_llm_response(self, prompt: str) -> str:
+        """
+        Speak the LLM reply sentence by sentence while it is still being
+        generated. Returns the full reply text.
+        """
+        parts: List[str] = []
+        pending = ""
+        async for chunk in self._llm_response_stream(prompt):
+            parts.append(chunk)
+            *sentences, pending = SENTENCE_END.split(pending + chunk)
+            for sentence in sentences:
+                if sentence.strip():
+                    await self.speak(sentence.strip())
+
+        text = "".join(parts).strip()
+        if not text:
+            text = "I’m listening."
+            await self.speak(text)
+        elif pending.strip():
+            await self.speak(pending.strip())
+        return text
 
     # --------------------------------------------------
     # Shutdown
@@ -241,12 +638,31 @@ class MikaAssistant:
         if asyncio.iscoroutinefunction(self.speak_fn):
             await self.speak_fn(text)
         else:
-            await asyncio.to_thread(self.speak_fn, text)
+            await self._to_thread(self.speak_fn, text)
 
     async def shutdown(self) -> None:
         if self.shutdown_event.is_set():
             return
         self.shutdown_event.set()
-        await asyncio.to_thread(self.memory.summarize_long_term)
-        await asyncio.to_thread(self.memory.save)
+        if self._nlp_task:
+            self._nlp_task.cancel()
+        if self._saver_task:
+            self._saver_task.cancel()
+            self._saver_task = None
+        if self._memory_writer_task:
+            self._memory_writer_task.cancel()
+            self._memory_writer_task = None
+        if self._user_data_dirty.is_set():
+            await self._flush_user_data()
+        await self._to_thread(self.memory.summarize_long_term)
+        await self._to_thread(self.memory.save)
+        self._shutdown_done = True
+        # If a turn is still in flight, start() releases once it returns
+        if not self._running:
+            self._release()
         logger.info("MIKA shut down cleanly.")
+
+    def _release(self) -> None:
+        self.memory.close()
+        self._executor.shutdown(wait=False)
+        self._llm_executor.shutdown(wait=False)
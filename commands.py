@@ -1,18 +1,48 @@
 import logging
-from typing import Dict, Optional, List
+import re
+import time
+from typing import Any, Dict, Optional, List, Tuple
 from .config import Config
-from .utils import logger
+from .utils import logger, PhraseMatcher
 from .emotion import evaluate_user_response
 import datetime
 
+# Phrase tables used by fallback_chat
+GREETING_PHRASES = ("hi", "hello", "hey")
+WELLBEING_PHRASES = ("i'm good", "i am good", "doing well")
+CHAT_PHRASES = ("just chatting", "talk", "conversation")
+
+
+def _phrase_regex(phrases: Tuple[str, ...]) -> re.Pattern:
+    """Compile a whole-word alternation over phrases."""
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, phrases)) + r")\b")
+
+
+GREETING_RE = _phrase_regex(GREETING_PHRASES)
+WELLBEING_RE = _phrase_regex(WELLBEING_PHRASES)
+CHAT_RE = _phrase_regex(CHAT_PHRASES)
+
 class CommandProcessor:
+    __slots__ = (
+        "config",
+        "emotion_engine",
+        "commands",
+        "_commands_lower",
+        "context",
+        "max_history",
+        "_command_matcher",
+    )
+
     def __init__(self, config: Config, emotion_engine):
         self.config = config
         self.emotion_engine = emotion_engine
         # Dynamic command registry from config, with default fallback
         self.commands = self._load_commands_from_config()
+        self._commands_lower = {k.lower(): v for k, v in self.commands.items()}
         self.context = {"history": [], "last_intent": None, "last_entities": []}  # Contextual memory
         self.max_history = 5  # Limit history length
+        # One pass over the input finds every command keyword
+        self._command_matcher = PhraseMatcher(self._commands_lower)
 
     def _load_commands_from_config(self) -> Dict[str, callable]:
         """Load commands from config or use defaults if not specified."""
@@ -26,9 +56,13 @@ class CommandProcessor:
         }
         return getattr(self.config, "commands", default_commands)
 
+    def lookup(self, text_lower: str) -> Optional[Any]:
+        """Handler registered for an exact (case-insensitive) command, or None."""
+        return self._commands_lower.get(text_lower)
+
     async def process(self, command: str, intent: str, metadata: Dict) -> str:
         """Process command with intent chaining and contextual memory."""
-        command_lower = command.lower()
+        command_lower = metadata.get("text_lower") or command.lower()
         self._update_context(command, intent, metadata)
 
         # Check for chained intents based on context
@@ -36,10 +70,12 @@ class CommandProcessor:
         if response:
             return response
 
-        # Match and execute command
-        for keyword, handler in self.commands.items():
-            if keyword in command_lower:
-                return await handler(command, metadata)
+        # Match and execute command (first keyword in registry order wins)
+        matched = self._command_matcher.search(command_lower)
+        if matched:
+            for keyword, handler in self._commands_lower.items():
+                if keyword in matched:
+                    return await handler(command, metadata)
 
         # Fallback to conversational response
         return await self.fallback_chat(command, intent, metadata)
@@ -62,20 +98,41 @@ class CommandProcessor:
         """Set a timer based on user command."""
         try:
             # Parse command for duration (e.g., "set timer 5 minutes")
-            parts = command.lower().split()
+            parts = (metadata.get("text_lower") or command.lower()).split()
             if len(parts) < 3 or parts[0] != "set" or parts[1] != "timer":
                 return "I didn’t catch that. Please say 'set timer X minutes'."
             duration = int(parts[2])
             if duration <= 0:
                 return "Please set a positive duration."
-            from datetime import datetime
-            timer = {"set_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "duration": duration, "notified": False}
+            timer = {"set_ns": time.time_ns(), "duration_s": duration * 60, "notified": False}
             self.config.state.user_data["timers"].append(timer)
             self.config.save_user_data()
             return f"Timer set for {duration} minutes!"
         except (ValueError, IndexError):
             return "Invalid timer format. Try 'set timer 5 minutes'."
 
+    @staticmethod
+    def _upgrade_timer(timer: Dict) -> Dict:
+        """Convert a timer saved in the old string format in place."""
+        if "set_ns" not in timer:
+            set_time = datetime.datetime.strptime(timer.pop("set_time"), "%Y-%m-%d %H:%M:%S")
+            timer["set_ns"] = int(set_time.timestamp() * 1_000_000_000)
+            timer["duration_s"] = timer.pop("duration") * 60
+        return timer
+
+    @classmethod
+    def timer_due(cls, timer: Dict, now_ns: Optional[int] = None) -> bool:
+        """True once the timer's duration has elapsed."""
+        timer = cls._upgrade_timer(timer)
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        return now_ns - timer["set_ns"] >= timer["duration_s"] * 1_000_000_000
+
+    def get_set_time_str(self, timer: Dict) -> str:
+        """Format when the timer was set, in the configured timezone."""
+        timer = self._upgrade_timer(timer)
+        set_time = datetime.datetime.fromtimestamp(timer["set_ns"] / 1_000_000_000, tz=self.config.ist)
+        return set_time.strftime("%Y-%m-%d %H:%M:%S")
+
     async def list_projects(self, command: str, metadata: Dict) -> str:
         """List current projects."""
         projects = self.config.state.user_data.get("projects", {})
@@ -86,7 +143,7 @@ class CommandProcessor:
     async def fallback_chat(self, command: str, intent: str, metadata: Dict) -> str:
         """Default response for unrecognized or simple commands with sentiment and context."""
         user_name = self.config.user_name
-        command_lower = command.lower()
+        command_lower = metadata.get("text_lower") or command.lower()
         entities = metadata.get("entities", [])
         compound = metadata.get("sentiment", {}).get("compound", 0.0)
 
@@ -94,7 +151,6 @@ class CommandProcessor:
         log_entries, updated_state = evaluate_user_response(command, self.config.personality["reward_system"], self.emotion_engine, compound)
         for entry in log_entries:
             logger.info(entry)
-        self.emotion_engine.emotional_summary()  # Update internal state
 
         # Intent-specific responses
         if intent == "thank you":
@@ -105,7 +161,7 @@ class CommandProcessor:
             mood = "great and cheerful" if state["happiness"] > 0.7 else "okay and steady" if state["happiness"] > 0.3 else "gentle and supportive" if state["sadness"] > 0.5 else "calm"
             return f"I'm feeling {mood}, {user_name}. {compound > 0.5 and 'Your positivity lifts me!' or 'How can I support you today?'}"
 
-        elif intent == "greeting" or any(phrase in command_lower for phrase in ["hi", "hello", "hey"]):
+        elif intent == "greeting" or GREETING_RE.search(command_lower) is not None:
             greeting = f"Hi {user_name} 😊 I'm right here. What would you like to do?"
             if entities and entities[0][1] == "PERSON":
                 greeting += f" Nice to see you, {entities[0][0]}!"
@@ -113,11 +169,11 @@ class CommandProcessor:
                 greeting += f" Good to see you again, {self.context['last_entities'][0][0]}!"
             return greeting
 
-        elif any(phrase in command_lower for phrase in ["i'm good", "i am good", "doing well"]):
+        elif WELLBEING_RE.search(command_lower) is not None:
             self._log_user_response(command, "task_success")
             return f"Glad to hear that, {user_name}. Makes me happy too! 🌟"
 
-        elif intent == "conversation" or any(phrase in command_lower for phrase in ["just chatting", "talk", "conversation"]):
+        elif intent == "conversation" or CHAT_RE.search(command_lower) is not None:
             topic = next((ent[0] for ent in entities if ent[1] in ["PERSON", "GPE", "EVENT"]), 
                         next((h["metadata"]["entities"][0][0] for h in self.context["history"] if h["metadata"]["entities"] and h["metadata"]["entities"][0][1] in ["PERSON", "GPE", "EVENT"]), "anything"))
             return f"Of course, {user_name}. We can talk about {topic} — I'm listening. 🎶"
@@ -129,9 +185,9 @@ class CommandProcessor:
         return f"I'm here, {user_name}. Could you tell me more about what you're thinking? {next((ent[0] for ent in self.context['last_entities'] if ent[1] in ['PERSON', 'GPE']), 'anything')}? 😄"
 
     def _log_user_response(self, command: str, reward_type: str = None):
-        logger.info(f"Command received: {command}")
+        logger.info("Command received: %s", command)
         if reward_type:
-            logger.info(f"Reward triggered: {reward_type}")
+            logger.info("Reward triggered: %s", reward_type)
             if reward_type == "task_success":
                 self.emotion_engine.adjust_emotions(2)
             elif reward_type == "user_disappointment":
@@ -1,12 +1,77 @@
 import json
 import os
-from dataclasses import dataclass, asdict, field
-from typing import Dict, Any, List
+from dataclasses import dataclass, asdict, field, fields, replace
+from typing import Dict, Any, Iterator, List, Optional, Callable, Mapping
 from pytz import timezone, UnknownTimeZoneError
-from .utils import logger
+from .utils import logger, json_loads, json_dumps, atomic_write_bytes
 
-# Define default configurations outside the class for readability
-DEFAULT_PERSONALITY = {
+class FrozenDict(Mapping):
+    """
+    Read-only dict for shared config defaults. Copies (copy.deepcopy,
+    dataclasses.asdict, pickle) come back as plain, mutable dicts.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data: Mapping[str, Any]):
+        self._data = dict(data)
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._data
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._data.get(key, default)
+
+    def __repr__(self) -> str:
+        return f"FrozenDict({self._data!r})"
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> Dict[str, Any]:
+        return _thaw(self)
+
+    def __reduce__(self):
+        return (dict, (_thaw(self),))
+
+
+def _freeze(value: Any) -> Any:
+    """Recursively turn dicts into read-only mappings and lists into tuples."""
+    if isinstance(value, dict):
+        return FrozenDict({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    """Inverse of _freeze: deep-copy into plain dicts and lists."""
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_thaw(v) for v in value]
+    return value
+
+
+def _is_frozen(value: Any) -> bool:
+    if isinstance(value, (FrozenDict, tuple)):
+        return True
+    if isinstance(value, dict):
+        return any(_is_frozen(v) for v in value.values())
+    if isinstance(value, list):
+        return any(_is_frozen(v) for v in value)
+    return False
+
+
+# Define default configurations outside the class for readability.
+# Frozen so every Config can share it without copying.
+DEFAULT_PERSONALITY = _freeze({
     "emotional_tone": {
         "default_mood": "normal",
         "mood_shift_rules": {
@@ -76,19 +141,19 @@ DEFAULT_PERSONALITY = {
         },
         "affinity_bonus_triggers": ["thank you", "you made my day", "fantastic job"]
     }
-}
+})
 
 class ModelLoadError(Exception):
     """Exception raised for errors encountered during model loading."""
     pass
 
-@dataclass
+@dataclass(slots=True)
 class UserState:
     user_data: Dict[str, Any] = field(default_factory=lambda: {"timers": [], "projects": {}})
     emotion_state: Dict[str, float] = field(default_factory=lambda: {"happiness": 0.5, "sadness": 0.2, "curiosity": 0.3, "affinity": 0.0})
     affinity_points: int = 0
 
-@dataclass
+@dataclass(slots=True)
 class Config:
     ai_name: str = "MIKA"
     user_name: str = "Yuu"
@@ -96,8 +161,16 @@ class Config:
     exit_phrases: List[str] = field(default_factory=lambda: ["goodbye", "exit", "shut down"])
     mode: str = "text"  # Options: 'text' or 'voice'
     test_mode: bool = False  # Enable synthetic input/output for testing
-    personality: Dict[str, Any] = field(default_factory=lambda: DEFAULT_PERSONALITY.copy())
+    personality: Mapping[str, Any] = field(default_factory=lambda: DEFAULT_PERSONALITY)  # Shared, read-only; see mutable_personality()
     model_path: str = field(default_factory=lambda: "C:/Users/yuufo/OneDrive/Documents/ai_trials/mika_trial/mistral-7b-instruct-v0.1.Q5_K_M.gguf")  # Confirmed path
+    n_gpu_layers: Optional[int] = None  # None = probe free VRAM, -1 = offload all
+    tensor_split: Optional[List[float]] = None  # e.g. [1.0, 1.0] to split across two GPUs
+    n_batch: int = 512
+    quantization: str = "Q4_K_M"  # Picks the matching .gguf when model_path is a directory
+    use_mmap: bool = True
+    use_mlock: bool = True
+    flash_attn: bool = True
+    offload_kqv: bool = True
     timezone: str = "Asia/Kolkata"
     timer_check_interval: int = 10  # Seconds
     heartbeat_interval: int = 60    # Seconds
@@ -110,24 +183,27 @@ class Config:
         "i'm good": "mika_trial.commands.CommandProcessor.fallback_chat"
     })
     state: UserState = field(default_factory=UserState)
+    ist: Any = field(init=False, repr=False, compare=False, default=None)  # Set from timezone
+    # Set by the assistant to defer save_user_data() to its write-behind task
+    _save_scheduler: Optional[Callable[[], None]] = field(init=False, repr=False, compare=False, default=None)
 
     def __post_init__(self):
         # Validate and set timezone
         try:
             self.ist = timezone(self.timezone)
         except (UnknownTimeZoneError, Exception) as e:
-            logger.error(f"Error setting timezone '{self.timezone}': {e}. Falling back to 'Asia/Kolkata'.")
+            logger.error("Error setting timezone '%s': %s. Falling back to 'Asia/Kolkata'.", self.timezone, e)
             self.timezone = "Asia/Kolkata"
             self.ist = timezone(self.timezone)
 
         # Validate mode
         if self.mode not in ["text", "voice"]:
-            logger.warning(f"Invalid mode '{self.mode}'. Defaulting to 'text'.")
+            logger.warning("Invalid mode '%s'. Defaulting to 'text'.", self.mode)
             self.mode = "text"
 
         # Validate model path and log warning if invalid, but proceed
         if not os.path.exists(self.model_path):
-            logger.warning(f"Model path '{self.model_path}' does not exist. Proceeding without model.")
+            logger.warning("Model path '%s' does not exist. Proceeding without model.", self.model_path)
         else:
             self.model_path = os.path.abspath(self.model_path)
 
@@ -135,7 +211,7 @@ class Config:
         required_emotion_keys = {"happiness", "sadness", "curiosity", "affinity"}
         for key in required_emotion_keys:
             if key not in self.state.emotion_state or not isinstance(self.state.emotion_state[key], (int, float)) or not 0 <= self.state.emotion_state[key] <= 1:
-                logger.warning(f"Invalid {key} in emotion_state. Setting to default 0.5.")
+                logger.warning("Invalid %s in emotion_state. Setting to default 0.5.", key)
                 self.state.emotion_state[key] = 0.5
 
     @classmethod
@@ -143,65 +219,103 @@ class Config:
         """Load configuration from a JSON file with fallback to defaults."""
         default_config = cls()
         if not os.path.exists(filename):
-            logger.warning(f"Config file '{filename}' not found. Using defaults.")
+            logger.warning("Config file '%s' not found. Using defaults.", filename)
             return default_config
 
         try:
-            with open(filename, 'r', encoding='utf-8') as f:
-                file_config = json.load(f)
-                logger.debug(f"Loaded config: {file_config}")  # Debug the raw config
-                config_dict = asdict(default_config)
-                # Handle state explicitly to avoid unexpected arguments
-                if "state" in file_config:
-                    state_data = file_config["state"]
-                    if not isinstance(state_data, dict):
-                        logger.error(f"Invalid state data type in config: {type(state_data)}. Using default state.")
-                        config_dict["state"] = default_config.state
-                    else:
-                        state_dict = {k: v for k, v in state_data.items() if k in asdict(default_config.state)}
-                        config_dict["state"] = UserState(**state_dict) if state_dict else default_config.state
+            with open(filename, 'rb') as f:
+                file_config = json_loads(f.read())
+            logger.debug("Loaded config: %s", file_config)  # Debug the raw config
+
+            # Handle state explicitly to avoid unexpected arguments
+            state = default_config.state
+            if "state" in file_config:
+                state_data = file_config["state"]
+                if not isinstance(state_data, dict):
+                    logger.error("Invalid state data type in config: %s. Using default state.", type(state_data))
                 else:
-                    config_dict["state"] = default_config.state
-                # Merge other config fields, excluding state
-                merge_dict = {k: v for k, v in file_config.items() if k != "state"}
-                cls._merge_configs(config_dict, merge_dict)
-                logger.debug(f"Merged config: {config_dict}")  # Debug the merged config
-                # Filter out unexpected keys before instantiation
-                valid_keys = {k for k in asdict(default_config)}
-                config_dict = {k: v for k, v in config_dict.items() if k in valid_keys}
-                return cls(**config_dict)
+                    state_keys = {f.name for f in fields(UserState)}
+                    state_dict = {k: v for k, v in state_data.items() if k in state_keys}
+                    if state_dict:
+                        state = UserState(**state_dict)
+
+            # Merge other known fields recursively over the defaults
+            valid_keys = {f.name for f in fields(cls) if f.init and f.name != "state"}
+            overrides = {}
+            for key, value in file_config.items():
+                if key not in valid_keys:
+                    continue
+                default_value = getattr(default_config, key)
+                value = cls._merge_configs(default_value, value)
+                # Stay frozen like the default until mutable_personality()
+                if _is_frozen(default_value):
+                    value = _freeze(value)
+                overrides[key] = value
+
+            config = replace(default_config, state=state, **overrides)
+            logger.debug("Merged config: %s", config)  # Debug the merged config
+            return config
         except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON in '{filename}': {e}. Using defaults.")
+            logger.error("Invalid JSON in '%s': %s. Using defaults.", filename, e)
             return default_config
         except Exception as e:
-            logger.error(f"Error loading config file: {e}. Using defaults.")
+            logger.error("Error loading config file: %s. Using defaults.", e)
             return default_config
 
     @staticmethod
-    def _merge_configs(default: Dict, user: Dict) -> Dict:
-        """Recursively merge user config with default config."""
-        for key, value in user.items():
-            if key in default and isinstance(default[key], dict) and isinstance(value, dict):
-                default[key] = Config._merge_configs(default[key], value)
-            elif key in default and isinstance(default[key], list) and isinstance(value, list):
-                default[key] = value if len(value) == len(default[key]) or not default[key] else default[key] + value
-            else:
-                default[key] = value
-        return default
+    def _merge_configs(default: Any, user: Any) -> Any:
+        """
+        Recursively merge a user config value over its default, returning a
+        fresh value (neither input is modified). Dicts merge key by key;
+        lists are replaced when the lengths match, extended otherwise.
+        """
+        if isinstance(default, Mapping) and isinstance(user, dict):
+            merged = dict(default)
+            for key, value in user.items():
+                merged[key] = Config._merge_configs(default[key], value) if key in default else value
+            return merged
+        if isinstance(default, (list, tuple)) and isinstance(user, list):
+            if len(user) == len(default) or not default:
+                return list(user)
+            return [*default, *user]
+        return user
+
+    def mutable_personality(self) -> Dict[str, Any]:
+        """
+        Copy-on-write access to the personality: shared frozen defaults are
+        deep-copied into a private dict before the first write.
+        """
+        if _is_frozen(self.personality):
+            self.personality = _thaw(self.personality)
+        return self.personality
 
     def save_user_data(self):
-        """Save user-specific state to the config file."""
+        """Save user-specific state, via the write-behind scheduler if one is attached."""
+        if self._save_scheduler is not None:
+            self._save_scheduler()
+        else:
+            self.write_user_data()
+
+    def user_data_bytes(self) -> bytes:
+        """Serialize user-specific state; call on the thread that mutates it."""
+        return json_dumps(asdict(self.state), indent=True)
+
+    def write_user_data(self, data: Optional[bytes] = None):
+        """
+        Write user-specific state to the config file (atomic replace).
+        Pass pre-serialized data to do only the file I/O here.
+        """
         try:
-            with open("config.json", 'w', encoding='utf-8') as f:
-                save_data = asdict(self.state)
-                json.dump(save_data, f, indent=4)
+            if data is None:
+                data = self.user_data_bytes()
+            atomic_write_bytes("config.json", data)
         except Exception as e:
-            logger.error(f"Failed to save user data: {e}")
+            logger.error("Failed to save user data: %s", e)
 
     @classmethod
     def load_from_file(cls, filename: str = "config.json") -> 'Config':
         """
         Alias for from_file() to maintain compatibility with code expecting load_from_file.
         """
-        logger.debug(f"Loading config from file using load_from_file: {filename}")
+        logger.debug("Loading config from file using load_from_file: %s", filename)
         return cls.from_file(filename)
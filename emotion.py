@@ -1,10 +1,41 @@
-from typing import Tuple, Dict, List, Any
-from .utils import logger
+import logging
+
+import numpy as np
+from typing import Tuple, Dict, List, Any, Optional, Mapping
+from .config import FrozenDict
+from .utils import logger, PhraseMatcher
+
+# Compiled reward indexes per frozen (FrozenDict) reward config, keyed
+# by id(). The config is kept next to its index so a recycled id can never
+# be mistaken for it. Mutable configs are never cached, since they can be
+# edited in place after Config.mutable_personality().
+_INDEX_CACHE: Dict[int, Tuple[Mapping[str, Any], "RewardIndex"]] = {}
+_INDEX_CACHE_MAX = 16
+
+# Emotion axes, in storage order
+EMOTION_KEYS = ("happiness", "sadness", "curiosity", "affinity")
+_EMOTION_INDEX = {k: i for i, k in enumerate(EMOTION_KEYS)}
+# Per-axis scale applied by adjust_emotions(delta)
+_ADJUST_COEFS = np.array([0.1, -0.05, 0.02, 0.01])
+
 
 class EmotionState:
     def __init__(self):
-        # Keep values between 0 and 1
-        self.emotion_state = {"happiness": 0.5, "sadness": 0.2, "curiosity": 0.3, "affinity": 0.0}
+        # Keep values between 0 and 1, stored in EMOTION_KEYS order
+        self._vals = np.array([0.5, 0.2, 0.3, 0.0])
+        # emotional_summary() result, rebuilt only after the state changes
+        self._summary_cache: Optional[Dict[str, float]] = None
+        self._dirty = True
+
+    def __getitem__(self, emotion: str) -> float:
+        return float(self._vals[_EMOTION_INDEX[emotion]])
+
+    def __setitem__(self, emotion: str, value: float) -> None:
+        self._vals[_EMOTION_INDEX[emotion]] = value
+        self._dirty = True
+
+    def __contains__(self, emotion: str) -> bool:
+        return emotion in _EMOTION_INDEX
 
     def adjust_emotions(self, delta: float):
         """
@@ -12,24 +43,70 @@ class EmotionState:
         Positive delta increases happiness etc., negative reduces.
         """
         # small scaled changes so deltas are not too aggressive
-        self.emotion_state["happiness"] = max(0.0, min(1.0, self.emotion_state["happiness"] + delta * 0.1))
-        self.emotion_state["sadness"] = max(0.0, min(1.0, self.emotion_state["sadness"] - delta * 0.05))
-        self.emotion_state["curiosity"] = max(0.0, min(1.0, self.emotion_state["curiosity"] + delta * 0.02))
-        self.emotion_state["affinity"] = max(0.0, min(1.0, self.emotion_state["affinity"] + delta * 0.01))
+        np.clip(self._vals + delta * _ADJUST_COEFS, 0.0, 1.0, out=self._vals)
+        self._dirty = True
 
     def update_emotion(self, emotion: str, value: float):
-        if emotion in self.emotion_state:
-            self.emotion_state[emotion] = max(0.0, min(1.0, value))
+        if emotion in _EMOTION_INDEX:
+            self._vals[_EMOTION_INDEX[emotion]] = max(0.0, min(1.0, value))
+            self._dirty = True
 
     def emotional_summary(self) -> Dict[str, float]:
-        return self.emotion_state.copy()
+        """
+        Snapshot of the current emotions. The dict is shared between calls
+        until the state changes, so callers must not mutate it.
+        """
+        if self._dirty:
+            self._summary_cache = dict(zip(EMOTION_KEYS, self._vals.tolist()))
+            self._dirty = False
+        return self._summary_cache
 
     # convenience helpers used by older code
     def to_dict(self) -> Dict[str, float]:
         return self.emotional_summary()
 
+class RewardIndex:
+    """
+    Precompiled keyword index for one reward_system config: every phrase
+    mapped to its ("pos" | "neg" | "int", weight) tags, plus a matcher that
+    finds all of them in a single pass.
+    """
+
+    def __init__(self, reward_cfg: Mapping[str, Any]):
+        tags: Dict[str, List[Tuple[str, Optional[float]]]] = {}
+        # Intensity phrases first: their emotion adjustments are applied in
+        # config order, while keyword counts don't depend on order.
+        for phrase, w in reward_cfg.get("intensity_weights", {}).items():
+            tags.setdefault(phrase, []).append(("int", w))
+        for kw in reward_cfg.get("positive_keywords", []):
+            tags.setdefault(kw, []).append(("pos", None))
+        for kw in reward_cfg.get("negative_keywords", []):
+            tags.setdefault(kw, []).append(("neg", None))
+
+        self.tags = {phrase: tuple(t) for phrase, t in tags.items()}
+        self.matcher = PhraseMatcher(self.tags)
+
+
+def reward_index(reward_cfg: Mapping[str, Any]) -> RewardIndex:
+    """
+    Return the RewardIndex for a reward_system config; cached for frozen
+    configs, rebuilt on every call for mutable ones.
+    """
+    if not isinstance(reward_cfg, FrozenDict):
+        return RewardIndex(reward_cfg)
+
+    hit = _INDEX_CACHE.get(id(reward_cfg))
+    if hit is not None and hit[0] is reward_cfg:
+        return hit[1]
+
+    index = RewardIndex(reward_cfg)
+    if len(_INDEX_CACHE) >= _INDEX_CACHE_MAX:
+        _INDEX_CACHE.pop(next(iter(_INDEX_CACHE)))
+    _INDEX_CACHE[id(reward_cfg)] = (reward_cfg, index)
+    return index
+
 def evaluate_user_response(command: str,
-                           reward_cfg: Dict[str, Any],
+                           reward_cfg: Mapping[str, Any],
                            emotion_engine: EmotionState,
                            reward_system_obj = None,
                            sentiment: float = 0.0) -> Dict[str, float]:
@@ -41,6 +118,8 @@ def evaluate_user_response(command: str,
     - Returns a simple sentiment dict: {'positive': n_pos, 'negative': n_neg, 'compound': float}
     """
 
+    # Build log lines only when they will actually be emitted
+    debug = logger.isEnabledFor(logging.DEBUG)
     log_entries: List[str] = []
     command_lower = (command or "").lower()
     positive_count = 0
@@ -48,34 +127,35 @@ def evaluate_user_response(command: str,
     compound = 0.0
 
     # Use reward_cfg keywords (if provided) to estimate sentiment
-    if isinstance(reward_cfg, dict):
-        pos_keywords = reward_cfg.get("positive_keywords", [])
-        neg_keywords = reward_cfg.get("negative_keywords", [])
-        intensity = reward_cfg.get("intensity_weights", {})
-
-        for kw in pos_keywords:
-            if kw in command_lower:
-                positive_count += 1
-                log_entries.append(f"Positive keyword matched: {kw}")
-
-        for kw in neg_keywords:
-            if kw in command_lower:
-                negative_count += 1
-                log_entries.append(f"Negative keyword matched: {kw}")
-
-        # Apply intensity weights if exact phrases present
-        for phrase, w in intensity.items():
-            if phrase in command_lower:
-                # positive weight -> reward; negative -> penalty
-                if w > 0:
+    if command_lower and isinstance(reward_cfg, Mapping):
+        index = reward_index(reward_cfg)
+        # One pass over the input finds every keyword / phrase present
+        matched = index.matcher.search(command_lower)
+
+        for phrase, tags in index.tags.items():
+            if phrase not in matched:
+                continue
+            for kind, w in tags:
+                if kind == "pos":
+                    positive_count += 1
+                    if debug:
+                        log_entries.append(f"Positive keyword matched: {phrase}")
+                elif kind == "neg":
+                    negative_count += 1
+                    if debug:
+                        log_entries.append(f"Negative keyword matched: {phrase}")
+                # Intensity weight: positive -> reward; negative -> penalty
+                elif w > 0:
                     emotion_engine.adjust_emotions(w)
-                    log_entries.append(f"Applied intensity weight {w} for '{phrase}'")
+                    if debug:
+                        log_entries.append(f"Applied intensity weight {w} for '{phrase}'")
                     if reward_system_obj and hasattr(reward_system_obj, "give_reward"):
                         reward_system_obj.give_reward(max(1, int(abs(w))), reason=f"intensity:{phrase}")
                 else:
                     # negative intensity
                     emotion_engine.adjust_emotions(w)
-                    log_entries.append(f"Applied negative intensity {w} for '{phrase}'")
+                    if debug:
+                        log_entries.append(f"Applied negative intensity {w} for '{phrase}'")
                     if reward_system_obj and hasattr(reward_system_obj, "give_penalty"):
                         reward_system_obj.give_penalty(max(1, int(abs(w))), reason=f"intensity:{phrase}")
 
@@ -84,12 +164,14 @@ def evaluate_user_response(command: str,
         compound += float(sentiment)
         if sentiment > 0.3:
             emotion_engine.adjust_emotions(1.0)
-            log_entries.append(f"Positive sentiment override {sentiment} boosted happiness.")
+            if debug:
+                log_entries.append(f"Positive sentiment override {sentiment} boosted happiness.")
             if reward_system_obj and hasattr(reward_system_obj, "give_reward"):
                 reward_system_obj.give_reward(1, reason="positive_sentiment_override")
         elif sentiment < -0.3:
             emotion_engine.adjust_emotions(-1.0)
-            log_entries.append(f"Negative sentiment override {sentiment} increased sadness.")
+            if debug:
+                log_entries.append(f"Negative sentiment override {sentiment} increased sadness.")
             if reward_system_obj and hasattr(reward_system_obj, "give_penalty"):
                 reward_system_obj.give_penalty(1, reason="negative_sentiment_override")
 
@@ -114,8 +196,9 @@ def evaluate_user_response(command: str,
             reward_system_obj.give_penalty(max(1, abs(net)), reason="keyword_negative")
 
     # Log results
-    for e in log_entries:
-        logger.debug(e)
+    if debug:
+        for e in log_entries:
+            logger.debug(e)
 
     sentiment_result = {"positive": positive_count, "negative": negative_count, "compound": float(compound)}
     return sentiment_result
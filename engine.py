@@ -1,15 +1,55 @@
+import copy
+import functools
+import time
 import yaml
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, Tuple, Union
+
+# libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timezone
+
+
+# Parsed governor files by path, revalidated against (mtime_ns, size) on each hit
+_YAML_CACHE: "OrderedDict[str, Tuple[int, int, Dict[str, Any]]]" = OrderedDict()
+_YAML_CACHE_MAX = 64
+
+# Sentinel for missing nodes in permission lookups
+_MISS = object()
+
+
+def _load_yaml_cached(path: Path) -> Dict[str, Any]:
+    """
+    Parse a YAML file, reusing the previous parse while the file is unchanged.
+    Callers get a deep copy so they can never alter the cached rules.
+    """
+    st = path.stat()
+    key = str(path.resolve())
+    hit = _YAML_CACHE.get(key)
+    if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+        _YAML_CACHE.move_to_end(key)
+        return copy.deepcopy(hit[2])
+
+    with path.open("r", encoding="utf-8") as f:
+        data = yaml.load(f, Loader=_YamlLoader)
+
+    _YAML_CACHE[key] = (st.st_mtime_ns, st.st_size, data)
+    _YAML_CACHE.move_to_end(key)
+    if len(_YAML_CACHE) > _YAML_CACHE_MAX:
+        _YAML_CACHE.popitem(last=False)
+    return copy.deepcopy(data)
 
 
 class GovernorViolation(Exception):
     """Raised when an action violates the Governor."""
 
 
-@dataclass
+@dataclass(frozen=True)
 class GovernorDecision:
     allowed: bool
     reason: str
@@ -22,16 +62,22 @@ class GovernorEngine:
     Mika may query this engine but never modify it.
     """
 
-    def __init__(self, governor_path: Path):
+    def __init__(self, governor_path: Union[str, Path]):
+        governor_path = Path(governor_path)
         if not governor_path.exists():
             raise FileNotFoundError(f"Governor file not found: {governor_path}")
 
-        with governor_path.open("r", encoding="utf-8") as f:
-            self.rules: Dict[str, Any] = yaml.safe_load(f)
+        self.rules: Dict[str, Any] = _load_yaml_cached(governor_path)
 
         self.version = self.rules["governor"]["version"]
         self.audit_log: list[dict] = []
 
+        # Rules never change after load, so per-path answers are memoized.
+        self._approvals = tuple(self.rules.get("approval_required_for", []))
+        self._lookup_permission = functools.lru_cache(maxsize=512)(self._lookup_permission_impl)
+        self._requires_approval = functools.lru_cache(maxsize=512)(self._requires_approval_impl)
+        self._decide = functools.lru_cache(maxsize=512)(self._decide_impl)
+
     # --------------------------------------------------
     # CORE QUERY INTERFACE
     # --------------------------------------------------
@@ -43,13 +89,7 @@ class GovernorEngine:
         - "tools.execute_code_in_sandbox"
         """
 
-        allowed = self._lookup_permission(permission_path)
-        decision = GovernorDecision(
-            allowed=allowed,
-            reason="allowed" if allowed else "forbidden",
-            requires_approval=self._requires_approval(permission_path),
-        )
-
+        decision = self._decide(permission_path)
         self._audit("permission_check", permission_path, decision)
         return decision
 
@@ -78,40 +118,65 @@ class GovernorEngine:
         return clamped
 
     def requires_approval(self, action: str) -> bool:
-        return action in self.rules.get("approval_required_for", [])
+        return action in self._approvals
 
     # --------------------------------------------------
     # INTERNALS
     # --------------------------------------------------
 
-    def _lookup_permission(self, path: str) -> bool:
+    def _decide_impl(self, path: str) -> GovernorDecision:
+        allowed = self._lookup_permission(path)
+        return GovernorDecision(
+            allowed=allowed,
+            reason="allowed" if allowed else "forbidden",
+            requires_approval=self._requires_approval(path),
+        )
+
+    def _lookup_permission_impl(self, path: str) -> bool:
         """
         Traverse permissions tree.
         """
-        parts = path.split(".")
         node = self.rules.get("permissions", {})
 
-        try:
-            for p in parts:
-                node = node[p]
-            return True
-        except Exception:
-            return False
+        for p in path.split("."):
+            if not isinstance(node, dict):
+                return False
+            node = node.get(p, _MISS)
+            if node is _MISS:
+                return False
+        return True
 
-    def _requires_approval(self, path: str) -> bool:
-        approvals = self.rules.get("approval_required_for", [])
-        return any(path.endswith(a) or a in path for a in approvals)
+    def _requires_approval_impl(self, path: str) -> bool:
+        return any(path.endswith(a) or a in path for a in self._approvals)
 
     def _audit(self, event: str, subject: str, decision: Any):
+        # Raw entries; formatting is deferred to iter_audit()
         self.audit_log.append(
             {
-                "time": datetime.utcnow().isoformat(),
+                "time_ns": time.time_ns(),
                 "event": event,
                 "subject": subject,
-                "decision": str(decision),
+                "decision": decision,
             }
         )
 
+    def iter_audit(self) -> Iterator[Dict[str, str]]:
+        """
+        Yield audit entries formatted for export (UTC ISO-8601 time,
+        stringified decision).
+        """
+        for entry in self.audit_log:
+            sec, ns = divmod(entry["time_ns"], 1_000_000_000)
+            ts = datetime.fromtimestamp(sec, timezone.utc).replace(
+                microsecond=ns // 1000, tzinfo=None
+            )
+            yield {
+                "time": ts.isoformat(),
+                "event": entry["event"],
+                "subject": entry["subject"],
+                "decision": str(entry["decision"]),
+            }
+
     # --------------------------------------------------
     # ENFORCEMENT
     # --------------------------------------------------
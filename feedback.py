@@ -2,17 +2,19 @@ import logging
 from typing import Dict, Optional
 from random import choice
 from .utils import logger
-from .emotion import EmotionState
+from .emotion import EmotionState, reward_index
 
 
 class RewardSystem:
     def __init__(self, config):
         self.config = config
         self.score = 0
+        # Warm the shared keyword index at load time rather than on the first message
+        reward_index(self.config.personality.get("reward_system", {}))
 
     def apply_reward(self, points: float, reason: str = "") -> None:
         self.score += points
-        logger.info(f"⭐ Reward {points} ({reason}), score={self.score}")
+        logger.info("⭐ Reward %s (%s), score=%s", points, reason, self.score)
 
         # Soft emotional coupling
         if points > 0:
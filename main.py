@@ -60,5 +60,5 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         logger.info("Force exit.")
     except Exception as e:
-        logger.exception(f"Unhandled exception: {e}")
+        logger.exception("Unhandled exception: %s", e)
         sys.exit(1)
@@ -1,9 +1,16 @@
-import json
+import asyncio
+import threading
 import time
+from collections import deque
+from itertools import islice
 from pathlib import Path
-from typing import List, Dict, Optional
-from dataclasses import dataclass, asdict
-from .utils import logger
+from typing import Deque, Iterable, List, Dict, Optional, Callable
+from dataclasses import dataclass, field, fields
+
+import numpy as np
+
+from .emotion import EMOTION_KEYS
+from .utils import logger, atomic_write_bytes, json_dumps, json_loads
 
 
 @dataclass
@@ -15,6 +22,15 @@ class MemoryItem:
     emotion: Dict[str, float]
     importance: float
     summary: Optional[str] = None
+    # LLM token ids for this turn's context line; cached, never persisted
+    tokens: Optional[List[int]] = field(default=None, repr=False, compare=False)
+
+    def to_dict(self) -> Dict:
+        # Persisted fields only; asdict() would deep-copy the token cache
+        return {f: getattr(self, f) for f in _PERSISTED_FIELDS}
+
+
+_PERSISTED_FIELDS = tuple(f.name for f in fields(MemoryItem) if f.name != "tokens")
 
 
 class MemoryCore:
@@ -23,37 +39,142 @@ class MemoryCore:
         memory_path: str = "mika_memory.json",
         short_term_limit: int = 10,
         importance_threshold: float = 0.6,
+        snapshot_every: int = 50,
+        context_block: int = 4,
     ):
+        # Snapshot file + append-only log of interactions since that snapshot
         self.memory_file = Path(memory_path)
+        self.log_file = self.memory_file.with_suffix(".jsonl")
         self.short_term_limit = short_term_limit
         self.importance_threshold = importance_threshold
+        self.snapshot_every = snapshot_every
+        # The prompt transcript drops this many turns at once when full, so
+        # between drops it only grows at the end (keeps the LLM's KV cache)
+        self.context_block = max(1, min(context_block, short_term_limit))
 
-        self.short_term: List[MemoryItem] = []
+        self.short_term: Deque[MemoryItem] = deque(maxlen=short_term_limit)
         self.long_term: List[MemoryItem] = []
+        # Number of trailing short_term turns shown in the prompt transcript
+        self._context_len = 0
+        # short_term emotions as a (len, EMOTION_KEYS) matrix; rebuilt lazily
+        self._emotion_mat: Optional[np.ndarray] = None
+
+        # Set by the assistant once the LLM is loaded (text -> token ids)
+        self.tokenizer: Optional[Callable[[str], List[int]]] = None
+
+        # Encoded log lines not yet on disk; guarded by _lock together with
+        # the in-memory lists. _io_lock serializes log/snapshot writes.
+        self._pending: List[bytes] = []
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._dirty = asyncio.Event()
+        self._writer_running = False
 
+        # Sequence number of the latest interaction. Stored in every log line
+        # and in the snapshot, so replay never depends on the wall clock.
+        self._seq = 0
+        self._log_lines = 0
         self._load()
+        self._log = self.log_file.open("ab")
 
     # ---------------- Persistence ---------------- #
 
     def _load(self) -> None:
-        if not self.memory_file.exists():
-            return
-        try:
-            data = json.loads(self.memory_file.read_text(encoding="utf-8"))
-            self.short_term = [MemoryItem(**m) for m in data.get("short_term", [])]
-            self.long_term = [MemoryItem(**m) for m in data.get("long_term", [])]
-        except Exception as e:
-            logger.error(f"Failed to load memory: {e}")
+        if self.memory_file.exists():
+            try:
+                data = json_loads(self.memory_file.read_bytes())
+                self._seq = data.get("seq", 0)
+                self.short_term = deque(
+                    (MemoryItem(**m) for m in data.get("short_term", [])),
+                    maxlen=self.short_term_limit,
+                )
+                self.long_term = [MemoryItem(**m) for m in data.get("long_term", [])]
+                self._context_len = len(self.short_term)
+                self._emotion_mat = None
+            except Exception as e:
+                logger.error("Failed to load memory: %s", e)
+
+        if self.log_file.exists():
+            self._replay_log()
+
+    def _replay_log(self) -> None:
+        """
+        Re-apply interactions logged after the snapshot. Entries whose
+        sequence number is not above the snapshot's were already compacted
+        into it (e.g. a crash between writing the snapshot and truncating
+        the log).
+        """
+        snapshot_seq = self._seq
+        with self.log_file.open("rb") as f:
+            for line in f:
+                try:
+                    entry = json_loads(line)
+                    seq = entry.pop("seq")
+                    item = MemoryItem(**entry)
+                except Exception:
+                    logger.warning("Skipping unreadable memory log entry.")
+                    continue
+                if seq > snapshot_seq:
+                    self._remember(item)
+                    self._seq = max(self._seq, seq)
+                    self._log_lines += 1
 
     def save(self) -> None:
+        """Write a full snapshot and truncate the interaction log."""
+        with self._io_lock:
+            self._save_locked()
+
+    def _save_locked(self) -> None:
         try:
-            data = {
-                "short_term": [asdict(m) for m in self.short_term],
-                "long_term": [asdict(m) for m in self.long_term],
-            }
-            self.memory_file.write_text(json.dumps(data, indent=2), encoding="utf-8")
+            with self._lock:
+                data = {
+                    "seq": self._seq,
+                    "short_term": [m.to_dict() for m in self.short_term],
+                    "long_term": [m.to_dict() for m in self.long_term],
+                }
+            atomic_write_bytes(self.memory_file, json_dumps(data))
+            self._log.truncate(0)
+            self._log_lines = 0
         except Exception as e:
-            logger.error(f"Failed to save memory: {e}")
+            logger.error("Failed to save memory: %s", e)
+
+    def flush(self) -> None:
+        """Append pending interactions to the log; snapshot when it grows long."""
+        with self._io_lock:
+            with self._lock:
+                lines, self._pending = self._pending, []
+            if not lines:
+                return
+            try:
+                self._log.writelines(lines)
+                self._log.flush()
+            except Exception as e:
+                logger.error("Failed to append memory log: %s", e)
+                return
+
+            self._log_lines += len(lines)
+            if self._log_lines >= self.snapshot_every:
+                self._save_locked()
+
+    async def run_writer(self, debounce: float = 0.25) -> None:
+        """
+        Background writer: interactions arriving within one debounce window
+        are flushed together off the event loop. While this isn't running,
+        add_interaction writes synchronously.
+        """
+        self._writer_running = True
+        try:
+            while True:
+                await self._dirty.wait()
+                await asyncio.sleep(debounce)
+                self._dirty.clear()
+                await asyncio.to_thread(self.flush)
+        finally:
+            self._writer_running = False
+
+    def close(self) -> None:
+        self.flush()
+        self._log.close()
 
     # ---------------- Core Ops ---------------- #
 
@@ -73,33 +194,70 @@ class MemoryCore:
             emotion=emotion,
             importance=importance,
         )
+        if self.tokenizer:
+            item.tokens = self.tokenizer(self._format_turn(item))
+
+        entry = item.to_dict()
+        with self._lock:
+            self._seq += 1
+            entry["seq"] = self._seq
+            self._remember(item)
+            self._pending.append(json_dumps(entry) + b"\n")
 
+        if self._writer_running:
+            self._dirty.set()
+        else:
+            self.flush()
+
+    def _remember(self, item: MemoryItem) -> None:
+        self._emotion_mat = None
         self.short_term.append(item)
-        if len(self.short_term) > self.short_term_limit:
-            self.short_term.pop(0)
+        self._context_len += 1
+        if self._context_len > self.short_term_limit:
+            self._context_len -= self.context_block
 
-        if importance >= self.importance_threshold:
+        if item.importance >= self.importance_threshold:
             self.long_term.append(item)
 
-        self.save()
-
     # ---------------- Retrieval ---------------- #
 
+    @staticmethod
+    def _format_turn(m: MemoryItem) -> str:
+        return f"User: {m.user_input}\nMIKA: {m.assistant_response}\n"
+
+    def _context_items(self) -> Iterable[MemoryItem]:
+        """
+        Turns shown in the prompt: the newest _context_len of short_term.
+        The window start only moves in context_block steps, so from one
+        turn to the next the transcript is usually the previous one plus
+        the newest turn.
+        """
+        return islice(self.short_term, len(self.short_term) - self._context_len, None)
+
     def get_recent_context(self) -> str:
-        lines = []
-        for m in self.short_term:
-            lines.append(f"User: {m.user_input}")
-            lines.append(f"MIKA: {m.assistant_response}")
-        return "\n".join(lines)
+        return "".join(self._format_turn(m) for m in self._context_items()).rstrip("\n")
+
+    def get_recent_context_tokens(self) -> List[int]:
+        """
+        Token ids for get_recent_context() (plus a trailing newline), built
+        from per-item cached tokens. Requires a tokenizer.
+        """
+        tokens: List[int] = []
+        for m in self._context_items():
+            if m.tokens is None:
+                m.tokens = self.tokenizer(self._format_turn(m))
+            tokens.extend(m.tokens)
+        return tokens
 
     def get_emotional_trend(self) -> Dict[str, float]:
         if not self.short_term:
             return {}
-        totals: Dict[str, float] = {}
-        for m in self.short_term:
-            for k, v in m.emotion.items():
-                totals[k] = totals.get(k, 0.0) + v
-        return {k: v / len(self.short_term) for k, v in totals.items()}
+        if self._emotion_mat is None:
+            self._emotion_mat = np.array(
+                [[m.emotion.get(k, 0.0) for k in EMOTION_KEYS] for m in self.short_term],
+                dtype=np.float64,
+            )
+        return dict(zip(EMOTION_KEYS, self._emotion_mat.mean(axis=0).tolist()))
 
     # ---------------- Compression ---------------- #
 
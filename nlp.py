@@ -1,24 +1,102 @@
+import re
 import nltk
+import numpy as np
 import spacy
+from collections import Counter
+from pathlib import Path
 from nltk.corpus import wordnet as wn
+from scipy.sparse import csr_matrix
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.naive_bayes import MultinomialNB
-from typing import Tuple, Optional, Dict
+from typing import Tuple, Optional, Dict, List, Union
+from .utils import logger
+
+# Optional optimum / ONNX Runtime (int8 embedding model)
+try:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+except ImportError:
+    ORTModelForFeatureExtraction = None
 
 # Download necessary resources (run once)
 nltk.download('punkt', quiet=True)
 nltk.download('wordnet', quiet=True)
 nltk.download('averaged_perceptron_tagger', quiet=True)
 
-nlp = spacy.load("en_core_web_sm")
+# Only entities are used, so run just the NER component
+nlp = spacy.load(
+    "en_core_web_sm",
+    disable=["tagger", "parser", "attribute_ruler", "lemmatizer"],
+)
+
+# Max texts per spaCy nlp.pipe() call in analyze_batch
+NLP_BATCH_SIZE = 32
+
+# Word tokens, computed once per input. Broader than CountVectorizer's
+# default pattern, but the extra 1-char tokens are never in its vocabulary.
+WORD_RE = re.compile(r"\w+")
+
+# Inputs with fewer word tokens than this ("hi", "thank you") skip NER
+MIN_NER_TOKENS = 3
+
+# VADER's scores for empty input
+NEUTRAL_SENTIMENT = {"neg": 0.0, "neu": 0.0, "pos": 0.0, "compound": 0.0}
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_INT8_DIR = Path("models") / "all-MiniLM-L6-v2-int8"
+
+
+class QuantizedEncoder:
+    """
+    int8 ONNX Runtime export of a sentence-transformers model. encode()
+    mirrors SentenceTransformer.encode for the arguments used here: mean
+    pooling, optional L2 normalization, NumPy output.
+    """
+
+    def __init__(self, model_id: str = EMBEDDING_MODEL, save_dir: Path = EMBEDDING_INT8_DIR):
+        quantized = save_dir / "model_quantized.onnx"
+        if not quantized.exists():
+            logger.info("Exporting %s to int8 ONNX in %s...", model_id, save_dir)
+            model = ORTModelForFeatureExtraction.from_pretrained(model_id, export=True)
+            quantizer = ORTQuantizer.from_pretrained(model)
+            qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            quantizer.quantize(save_dir=save_dir, quantization_config=qconfig)
+            AutoTokenizer.from_pretrained(model_id).save_pretrained(save_dir)
+
+        self.model = ORTModelForFeatureExtraction.from_pretrained(save_dir, file_name=quantized.name)
+        self.tokenizer = AutoTokenizer.from_pretrained(save_dir)
+
+    def encode(self, sentences: Union[str, List[str]], normalize_embeddings: bool = False) -> np.ndarray:
+        single = isinstance(sentences, str)
+        batch = self.tokenizer(
+            [sentences] if single else list(sentences),
+            padding=True, truncation=True, return_tensors="np",
+        )
+        hidden = self.model(**batch).last_hidden_state
+        mask = batch["attention_mask"][..., None].astype(np.float32)
+        emb = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if normalize_embeddings:
+            emb /= np.clip(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12, None)
+        return emb[0] if single else emb
+
+
+def _load_embedding_model():
+    """Prefer the int8 ONNX encoder; fall back to the FP32 PyTorch model."""
+    if ORTModelForFeatureExtraction is not None:
+        try:
+            return QuantizedEncoder()
+        except Exception as e:
+            logger.warning("int8 embedding model unavailable (%s). Using SentenceTransformer.", e)
+    return SentenceTransformer('all-MiniLM-L6-v2')
 
 class TextUnderstandingLayer:
     def __init__(self, config):
         self.config = config
         self.sentiment_analyzer = SentimentIntensityAnalyzer()
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        self.embedding_model = _load_embedding_model()
 
         # Example training set for intent classification
         self.intent_examples = {
@@ -32,6 +110,21 @@ class TextUnderstandingLayer:
         self.vectorizer = CountVectorizer()
         self.classifier = MultinomialNB()
         self._train_intent_classifier()
+        self._build_example_index()
+
+    def _build_example_index(self):
+        """
+        Encode every intent example once into a single L2-normalized matrix,
+        so similarity against all of them is one matrix-vector product.
+        """
+        labels, slices, examples = [], [], []
+        for intent, phrases in self.intent_examples.items():
+            labels.append(intent)
+            slices.append(slice(len(examples), len(examples) + len(phrases)))
+            examples.extend(phrases)
+        self._intent_labels = labels
+        self._example_slices = slices
+        self._example_emb = self.embedding_model.encode(examples, normalize_embeddings=True)
 
     def _train_intent_classifier(self):
         X = []
@@ -41,6 +134,21 @@ class TextUnderstandingLayer:
             y.extend([intent] * len(phrases))
         X_vec = self.vectorizer.fit_transform(X)
         self.classifier.fit(X_vec, y)
+        self._vocab: Dict[str, int] = dict(self.vectorizer.vocabulary_)
+
+    def _vectorize(self, tokens: List[str]) -> csr_matrix:
+        """
+        Equivalent of vectorizer.transform([text]) for the lowercased tokens
+        of text, without scikit-learn's per-call validation and analyzer overhead.
+        """
+        vocab = self._vocab
+        counts = Counter(vocab[t] for t in tokens if t in vocab)
+        cols = list(counts)
+        return csr_matrix(
+            (list(counts.values()), ([0] * len(cols), cols)),
+            shape=(1, len(vocab)),
+            dtype=np.int64,
+        )
 
     def analyze(self, text: str) -> Tuple[str, Dict]:
         """
@@ -48,31 +156,59 @@ class TextUnderstandingLayer:
         """
         if not text or not isinstance(text, str):
             return "unknown", {}
+        cleaned, tokens = self._prepare(text)
+        doc = nlp(text) if len(tokens) >= MIN_NER_TOKENS else None
+        return self._analyze_doc(text, cleaned, tokens, doc)
+
+    def analyze_batch(self, texts: List[str]) -> List[Tuple[str, Dict]]:
+        """
+        Analyze several texts at once, running spaCy over them with nlp.pipe().
+        Results are returned in input order.
+        """
+        results: List[Tuple[str, Dict]] = [("unknown", {}) for _ in texts]
+        prepared = {
+            i: self._prepare(t) for i, t in enumerate(texts) if t and isinstance(t, str)
+        }
+        ner = [i for i, (_, tokens) in prepared.items() if len(tokens) >= MIN_NER_TOKENS]
+        docs = dict(zip(ner, nlp.pipe([texts[i] for i in ner], batch_size=NLP_BATCH_SIZE)))
+        for i, (cleaned, tokens) in prepared.items():
+            results[i] = self._analyze_doc(texts[i], cleaned, tokens, docs.get(i))
+        return results
 
+    @staticmethod
+    def _prepare(text: str) -> Tuple[str, List[str]]:
+        """Lowercase and tokenize once; shared by every stage of the analysis."""
         cleaned = text.lower().strip()
+        return cleaned, WORD_RE.findall(cleaned)
 
-        # Intent Classification
-        X_input = self.vectorizer.transform([cleaned])
-        predicted_intent = self.classifier.predict(X_input)[0]
-        intent_prob = max(self.classifier.predict_proba(X_input)[0])
+    def _analyze_doc(self, text: str, cleaned: str, tokens: List[str], doc) -> Tuple[str, Dict]:
+        """doc is the spaCy Doc for text, or None if NER was skipped."""
+        # Intent Classification (one NB evaluation gives both class and confidence)
+        X_input = self._vectorize(tokens)
+        log_p = self.classifier.predict_log_proba(X_input)[0]
+        idx = int(log_p.argmax())
+        predicted_intent = self.classifier.classes_[idx]
+        intent_prob = float(np.exp(log_p[idx]))
 
-        # Sentiment Analysis
-        sentiment = self.sentiment_analyzer.polarity_scores(cleaned)
+        # Sentiment Analysis (VADER also scores emoticons, so gate on the
+        # text rather than on word tokens)
+        sentiment = (
+            self.sentiment_analyzer.polarity_scores(cleaned) if cleaned else dict(NEUTRAL_SENTIMENT)
+        )
 
         # Named Entity Recognition (NER)
-        doc = nlp(text)
-        entities = [(ent.text, ent.label_) for ent in doc.ents]
-
-        # Semantic similarity to known intent examples
-        similarity_scores = {}
-        for intent, examples in self.intent_examples.items():
-            example_embeddings = self.embedding_model.encode(examples, convert_to_tensor=True)
-            input_embedding = self.embedding_model.encode(cleaned, convert_to_tensor=True)
-            max_sim = max(util.cos_sim(input_embedding, example_embeddings)[0])
-            similarity_scores[intent] = float(max_sim)
-
-        # Best semantic match if classifier is unsure
+        entities = [(ent.text, ent.label_) for ent in doc.ents] if doc is not None else []
+
+        # Best semantic match if classifier is unsure; the embedding pass is
+        # only needed then (cosine, as both sides are normalized)
+        similarity_scores: Dict[str, float] = {}
         if intent_prob < 0.6:
+            input_embedding = self.embedding_model.encode(cleaned, normalize_embeddings=True)
+            sims = self._example_emb @ input_embedding
+            similarity_scores = {
+                intent: float(sims[sl].max())
+                for intent, sl in zip(self._intent_labels, self._example_slices)
+            }
             predicted_intent = max(similarity_scores, key=similarity_scores.get)
 
         return predicted_intent, {
@@ -1,7 +1,26 @@
+import inspect
+import json
 import logging
 import logging.handlers
+import os
+import re
+import stat
+import tempfile
 from functools import wraps
 from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Set
+
+# Optional orjson (faster JSON encode/decode)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional pyahocorasick
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 # ---------------------------
 # Logger Setup
@@ -37,16 +56,131 @@ logger.info("Logging configuration initialized successfully")
 # ---------------------------
 # Exception Handling
 # ---------------------------
-def handle_exceptions(func):
+def handle_exceptions(func: Optional[Callable] = None, *, log: bool = True):
     """
-    Decorator for centralized exception handling in async functions.
+    Decorator for centralized exception handling.
     Logs the error and prevents crashes.
+
+    Usable bare (@handle_exceptions) or with options:
+    @handle_exceptions(log=False) leaves the function undecorated.
+    The wrapper is chosen once, at decoration time: coroutine functions
+    get an async wrapper, anything else a plain sync one.
     """
+    if func is None:
+        return lambda f: handle_exceptions(f, log=log)
+    if not log:
+        return func
+
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                logger.error("Error in %s: %s", func.__name__, e, exc_info=True)
+                return None
+        return async_wrapper
+
     @wraps(func)
-    async def wrapper(*args, **kwargs):
+    def wrapper(*args, **kwargs):
         try:
-            return await func(*args, **kwargs)
+            return func(*args, **kwargs)
         except Exception as e:
-            logger.error(f"Error in {func.__name__}: {e}", exc_info=True)
+            logger.error("Error in %s: %s", func.__name__, e, exc_info=True)
             return None
     return wrapper
+
+
+# ---------------------------
+# Phrase Matching
+# ---------------------------
+class PhraseMatcher:
+    """
+    Finds which of a fixed set of phrases occur as substrings of a text.
+    Uses a single Aho-Corasick pass when pyahocorasick is installed,
+    otherwise one scan with a precompiled regex union.
+    """
+
+    def __init__(self, phrases: Iterable[str]):
+        self.phrases = tuple(dict.fromkeys(p for p in phrases if p))
+        self._automaton = None
+        self._regex = None
+        if not self.phrases:
+            return
+
+        if ahocorasick:
+            automaton = ahocorasick.Automaton()
+            for phrase in self.phrases:
+                automaton.add_word(phrase, phrase)
+            automaton.make_automaton()
+            self._automaton = automaton
+            return
+
+        # Zero-width lookahead reports the longest phrase starting at every
+        # position; shorter phrases starting there are its prefixes.
+        longest_first = sorted(self.phrases, key=len, reverse=True)
+        self._regex = re.compile("(?=(" + "|".join(map(re.escape, longest_first)) + "))")
+        self._prefixes = {
+            q: frozenset(p for p in self.phrases if p != q and q.startswith(p))
+            for q in self.phrases
+        }
+
+    def search(self, text: str) -> Set[str]:
+        if self._automaton is not None:
+            return {phrase for _, phrase in self._automaton.iter(text)}
+        found: Set[str] = set()
+        if self._regex is not None:
+            for m in self._regex.finditer(text):
+                found.add(m.group(1))
+                found |= self._prefixes[m.group(1)]
+        return found
+
+
+# ---------------------------
+# JSON helpers
+# ---------------------------
+def json_loads(data: bytes) -> Any:
+    """Parse JSON bytes, using orjson when available."""
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj: Any, indent: bool = False) -> bytes:
+    """Serialize to UTF-8 JSON bytes, using orjson when available."""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+# Process umask, read once at import (os.umask can only be queried by setting it)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def atomic_write_bytes(path: Path, data: bytes) -> None:
+    """
+    Write data to a temp file next to path and rename it into place,
+    so readers never see a partially written file. The result keeps the
+    existing file's permissions, or gets the umask default for a new file.
+    """
+    path = Path(path)
+    try:
+        mode = stat.S_IMODE(path.stat().st_mode)
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        # mkstemp always creates 0600
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise